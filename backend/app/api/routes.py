@@ -1,76 +1,127 @@
+from functools import lru_cache
+from typing import Optional
+
 import numpy as np
-from fastapi import APIRouter, HTTPException
+import orjson
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import ORJSONResponse
 
 from app.schemas import (
     VeffRequest,
     VeffResponse,
     SimulateRequest,
     SimulateResponse,
+    SimulateBatchRequest,
+    SimulateBatchResponse,
     VeffNCRequest,
     VeffNCResponse,
     SimulateNCRequest,
     SimulateNCResponse,
 )
 from app.core.observables import veff2_schwarzschild, ueff_schwarzschild, veff2_nc_schwarzschild
-from app.core.geodesics import orbit_u_phi, orbit_r_phi_nc
+from app.core.geodesics import orbit_u_phi, orbit_u_phi_batch, orbit_r_phi_nc, trajectory_xy
 
 router = APIRouter()
 
+# A integração usa os n passos pedidos; a resposta é decimada para no máximo
+# n_out pontos (o gráfico não precisa de mais), reduzindo o JSON.
+_DEFAULT_N_OUT = 4000
+
+def _output_indices(k: int, n_out: Optional[int]) -> tuple[np.ndarray, int]:
+    """
+    Índices (e passo) para decimar k pontos válidos em no máximo n_out,
+    sempre incluindo o último (fim da órbita, p.ex. a queda no horizonte).
+    """
+    if n_out is None:
+        n_out = _DEFAULT_N_OUT
+    if k <= n_out:
+        return np.arange(k), 1
+    step = -(-(k - 1) // (n_out - 1))
+    return np.append(np.arange(0, k - 1, step), k - 1), step
+
 @router.get("/health")
 def health():
     return {"status": "ok"}
 
-@router.post("/veff", response_model=VeffResponse)
-def veff(req: VeffRequest):
-    r_h = 2.0 * req.M
-    if req.r_min <= r_h:
-        raise HTTPException(status_code=400, detail=f"r_min deve ser > 2M. 2M={r_h:.6g}")
+# Curvas de potencial são determinísticas nos parâmetros da requisição e o
+# frontend repete as mesmas chamadas; guardamos o JSON já serializado.
+# Só curvas com n <= _VEFF_CACHE_MAX_N (~130 kB por entrada), para que o
+# cache fique limitado em bytes (~17 MB por processo) e não só em entradas.
+_VEFF_CACHE_SIZE = 128
+_VEFF_CACHE_MAX_N = 4000
 
-    r = np.linspace(req.r_min, req.r_max, req.n, dtype=np.float64)
+def _veff_json(
+    metric: str, particle: str, M: float, E: float, L: float, r_min: float, r_max: float, n: int
+) -> bytes:
+    r_h = 2.0 * M
+    r = np.linspace(r_min, r_max, n, dtype=np.float64)
 
-    V2 = veff2_schwarzschild(r=r, M=req.M, E=req.E, L=req.L, particle=req.particle)
-    U = ueff_schwarzschild(r=r, M=req.M, L=req.L, particle=req.particle)
+    V2 = veff2_schwarzschild(r=r, M=M, E=E, L=L, particle=particle)
+    U = ueff_schwarzschild(r=r, M=M, L=L, particle=particle)
 
-    return VeffResponse(
-        r=r.tolist(),
-        U_eff=U.tolist(),
-        V_eff2=V2.tolist(),
-        meta={
-            "metric": req.metric,
-            "particle": req.particle,
-            "M": req.M,
-            "E": req.E,
-            "L": req.L,
-            "b": (req.L / req.E) if req.E != 0 else None,
-            "E2": req.E * req.E,
+    # float32 só na serialização (curvas para gráfico).
+    return orjson.dumps({
+        "r": r.astype(np.float32),
+        "U_eff": U.astype(np.float32),
+        "V_eff2": V2.astype(np.float32),
+        "meta": {
+            "metric": metric,
+            "particle": particle,
+            "M": M,
+            "E": E,
+            "L": L,
+            "b": (L / E) if E != 0 else None,
+            "E2": E * E,
             "r_horizon": r_h,
-            "photon_sphere": 3.0 * req.M,
-            "n": req.n,
+            "photon_sphere": 3.0 * M,
+            "n": n,
         },
-    )
+    }, option=orjson.OPT_SERIALIZE_NUMPY)
 
-@router.post("/veff_nc", response_model=VeffNCResponse)
-def veff_nc(req: VeffNCRequest):
-    r = np.linspace(req.r_min, req.r_max, req.n, dtype=np.float64)
-    V2 = veff2_nc_schwarzschild(r=r, M=req.M, theta=req.theta, L=req.L, particle=req.particle)
+def _veff_nc_json(
+    metric: str, particle: str, M: float, theta: float, E: float, L: float, r_min: float, r_max: float, n: int
+) -> bytes:
+    r = np.linspace(r_min, r_max, n, dtype=np.float64)
+    V2 = veff2_nc_schwarzschild(r=r, M=M, theta=theta, L=L, particle=particle)
 
-    return VeffNCResponse(
-        r=r.tolist(),
-        V_eff2=V2.tolist(),
-        meta={
-            "metric": req.metric,
-            "particle": req.particle,
-            "M": req.M,
-            "theta": req.theta,
-            "E": req.E,
-            "L": req.L,
-            "b": (req.L / req.E) if req.E != 0 else None,
-            "E2": req.E * req.E,
-            "n": req.n,
+    return orjson.dumps({
+        "r": r.astype(np.float32),
+        "V_eff2": V2.astype(np.float32),
+        "meta": {
+            "metric": metric,
+            "particle": particle,
+            "M": M,
+            "theta": theta,
+            "E": E,
+            "L": L,
+            "b": (L / E) if E != 0 else None,
+            "E2": E * E,
+            "n": n,
         },
+    }, option=orjson.OPT_SERIALIZE_NUMPY)
+
+_veff_json_cached = lru_cache(maxsize=_VEFF_CACHE_SIZE)(_veff_json)
+_veff_nc_json_cached = lru_cache(maxsize=_VEFF_CACHE_SIZE)(_veff_nc_json)
+
+@router.post("/veff", responses={200: {"model": VeffResponse}})
+def veff(req: VeffRequest):
+    r_h = 2.0 * req.M
+    if req.r_min <= r_h:
+        raise HTTPException(status_code=400, detail=f"r_min deve ser > 2M. 2M={r_h:.6g}")
+
+    build = _veff_json_cached if req.n <= _VEFF_CACHE_MAX_N else _veff_json
+    content = build(req.metric, req.particle, req.M, req.E, req.L, req.r_min, req.r_max, req.n)
+    return Response(content=content, media_type="application/json")
+
+@router.post("/veff_nc", responses={200: {"model": VeffNCResponse}})
+def veff_nc(req: VeffNCRequest):
+    build = _veff_nc_json_cached if req.n <= _VEFF_CACHE_MAX_N else _veff_nc_json
+    content = build(
+        req.metric, req.particle, req.M, req.theta, req.E, req.L, req.r_min, req.r_max, req.n
     )
+    return Response(content=content, media_type="application/json")
 
-@router.post("/simulate", response_model=SimulateResponse)
+@router.post("/simulate", responses={200: {"model": SimulateResponse}})
 def simulate(req: SimulateRequest):
     r_h = 2.0 * req.M
     if req.r0 <= r_h:
@@ -90,25 +141,17 @@ def simulate(req: SimulateRequest):
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    x = r * np.cos(phi)
-    y = r * np.sin(phi)
-
-    valid = np.isfinite(r) & np.isfinite(x) & np.isfinite(y)
-    if not np.all(valid):
-        first_invalid = int(np.argmax(~valid))
-        phi = phi[:first_invalid]
-        r = r[:first_invalid]
-        x = x[:first_invalid]
-        y = y[:first_invalid]
-
     captured = bool(len(r) > 0 and np.min(r) <= (r_h * 1.0005))
 
-    return SimulateResponse(
-        phi=phi.tolist(),
-        r=r.tolist(),
-        x=x.tolist(),
-        y=y.tolist(),
-        meta={
+    idx, step = _output_indices(len(phi), req.n_out)
+    phi, r, x, y = trajectory_xy(phi[idx], r[idx])
+
+    return ORJSONResponse({
+        "phi": phi,
+        "r": r,
+        "x": x,
+        "y": y,
+        "meta": {
             "metric": req.metric,
             "particle": req.particle,
             "M": req.M,
@@ -120,14 +163,72 @@ def simulate(req: SimulateRequest):
             "radial_sign": req.radial_sign,
             "phi_max": req.phi_max,
             "n": req.n,
+            "stride": step,
             "r_horizon": r_h,
             "photon_sphere": 3.0 * req.M,
             "captured": captured,
             "points_returned": int(len(r)),
         },
-    )
+    })
+
+@router.post("/simulate_batch", responses={200: {"model": SimulateBatchResponse}})
+def simulate_batch(req: SimulateBatchRequest):
+    r_h = 2.0 * req.M
+    if min(req.r0) <= r_h:
+        raise HTTPException(status_code=400, detail=f"r0 deve ser > 2M. 2M={r_h:.6g}")
+
+    try:
+        phi, r = orbit_u_phi_batch(
+            M=req.M,
+            Ls=req.L,
+            r0s=req.r0,
+            Es=req.E,
+            radial_sign=req.radial_sign,
+            phi_max=req.phi_max,
+            n=req.n,
+            particle=req.particle,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-@router.post("/simulate_nc", response_model=SimulateNCResponse)
+    captured = np.nanmin(r, axis=1) <= (r_h * 1.0005)
+    points = np.count_nonzero(np.isfinite(r), axis=1)
+
+    # Passo comum para a grade φ compartilhada, mais o último ponto válido de
+    # cada órbita (no máximo K índices extras), para que nenhuma perca o fim.
+    idx, step = _output_indices(int(points.max()), req.n_out)
+    idx = np.unique(np.concatenate([idx, points - 1]))
+    phi = phi[idx]
+    r = np.ascontiguousarray(r[:, idx])
+    # cos/sin da grade comum uma vez só, reaproveitados por todas as órbitas.
+    x = (r * np.cos(phi)).astype(np.float32)
+    y = (r * np.sin(phi)).astype(np.float32)
+
+    return ORJSONResponse({
+        "phi": phi.astype(np.float32),
+        "r": r.astype(np.float32),
+        "x": x,
+        "y": y,
+        "meta": {
+            "metric": req.metric,
+            "particle": req.particle,
+            "M": req.M,
+            "L": req.L,
+            "E": req.E,
+            "r0": req.r0,
+            "radial_sign": req.radial_sign,
+            "phi_max": req.phi_max,
+            "n": req.n,
+            "stride": step,
+            "r_horizon": r_h,
+            "photon_sphere": 3.0 * req.M,
+            "captured": captured.tolist(),
+            # Pontos de cada linha decimada: índices de idx até o último válido.
+            "points_returned": np.searchsorted(idx, points - 1, side="right").tolist(),
+        },
+    })
+
+@router.post("/simulate_nc", responses={200: {"model": SimulateNCResponse}})
 def simulate_nc(req: SimulateNCRequest):
     try:
         phi, r = orbit_r_phi_nc(
@@ -144,23 +245,15 @@ def simulate_nc(req: SimulateNCRequest):
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    x = r * np.cos(phi)
-    y = r * np.sin(phi)
-
-    valid = np.isfinite(r) & np.isfinite(x) & np.isfinite(y)
-    if not np.all(valid):
-        first_invalid = int(np.argmax(~valid))
-        phi = phi[:first_invalid]
-        r = r[:first_invalid]
-        x = x[:first_invalid]
-        y = y[:first_invalid]
-
-    return SimulateNCResponse(
-        phi=phi.tolist(),
-        r=r.tolist(),
-        x=x.tolist(),
-        y=y.tolist(),
-        meta={
+    idx, step = _output_indices(len(phi), req.n_out)
+    phi, r, x, y = trajectory_xy(phi[idx], r[idx])
+
+    return ORJSONResponse({
+        "phi": phi,
+        "r": r,
+        "x": x,
+        "y": y,
+        "meta": {
             "metric": req.metric,
             "particle": req.particle,
             "M": req.M,
@@ -173,6 +266,7 @@ def simulate_nc(req: SimulateNCRequest):
             "radial_sign": req.radial_sign,
             "phi_max": req.phi_max,
             "n": req.n,
+            "stride": step,
             "points_returned": int(len(r)),
         },
-    )
+    })
@@ -1,4 +1,7 @@
+import math
+
 import numpy as np
+from numba import njit
 
 def f_schwarzschild(r: np.ndarray, M: float) -> np.ndarray:
     return 1.0 - (2.0 * M) / r
@@ -26,38 +29,36 @@ def veff2_schwarzschild(r: np.ndarray, M: float, E: float, L: float, particle: s
 
     raise ValueError("particle deve ser 'massive' ou 'photon'")
 
-def _erf_approx(x: np.ndarray) -> np.ndarray:
-    # Abramowitz & Stegun 7.1.26 approximation (vectorized)
-    p = 0.3275911
-    a1 = 0.254829592
-    a2 = -0.284496736
-    a3 = 1.421413741
-    a4 = -1.453152027
-    a5 = 1.061405429
-    sign = np.sign(x)
-    ax = np.abs(x)
-    t = 1.0 / (1.0 + p * ax)
-    y = 1.0 - (((((a5 * t + a4) * t + a3) * t + a2) * t + a1) * t * np.exp(-ax * ax))
-    return sign * y
-
-def _lower_gamma_3half(x: np.ndarray) -> np.ndarray:
-    x = np.clip(x, 0.0, None)
-    sqrt_x = np.sqrt(x)
-    return 0.5 * np.sqrt(np.pi) * _erf_approx(sqrt_x) - sqrt_x * np.exp(-x)
-
-def f_nc_schwarzschild(r: np.ndarray, M: float, theta: float) -> np.ndarray:
+@njit(cache=True, nogil=True, fastmath=True, error_model="numpy")
+def _f_nc_scalar(r: float, M: float, theta: float) -> float:
+    # f(r) = 1 - 2m(r)/r da métrica NC, com m(r) = (2M/√π) γ(3/2, r²/4θ);
+    # escalar, para uso dentro de laços compilados com Numba.
     x = (r * r) / (4.0 * theta)
-    m = (2.0 * M / np.sqrt(np.pi)) * _lower_gamma_3half(x)
+    if x < 0.0:
+        x = 0.0
+    sx = math.sqrt(x)
+    ex = math.exp(-x)
+    gamma = 0.5 * math.sqrt(math.pi) * math.erf(sx) - sx * ex
+    m = (2.0 * M / math.sqrt(math.pi)) * gamma
     return 1.0 - (2.0 * m) / r
 
+@njit(cache=True, nogil=True, fastmath=True)
+def _veff2_nc_kernel(r: np.ndarray, M: float, theta: float, L: float, kappa: float) -> np.ndarray:
+    # Uma única passada sobre r (sem temporários intermediários).
+    # kappa = 1 (massivo) ou 0 (fóton).
+    out = np.empty(r.shape[0], dtype=np.float64)
+    L2 = L * L
+    for i in range(r.shape[0]):
+        ri = r[i]
+        f = _f_nc_scalar(ri, M, theta)
+        out[i] = f * (kappa + L2 / (ri * ri))
+    return out
+
 def veff2_nc_schwarzschild(r: np.ndarray, M: float, theta: float, L: float, particle: str) -> np.ndarray:
-    f = f_nc_schwarzschild(r, M, theta)
-    L2_over_r2 = (L * L) / (r * r)
-    if particle == "massive":
-        return f * (1.0 + L2_over_r2)
-    if particle == "photon":
-        return f * L2_over_r2
-    raise ValueError("particle deve ser 'massive' ou 'photon'")
+    if particle not in ("massive", "photon"):
+        raise ValueError("particle deve ser 'massive' ou 'photon'")
+    r = np.ascontiguousarray(r, dtype=np.float64)
+    return _veff2_nc_kernel(r, M, theta, L, 1.0 if particle == "massive" else 0.0)
 
 def ueff_schwarzschild(r: np.ndarray, M: float, L: float, particle: str) -> np.ndarray:
     """
@@ -1,9 +1,10 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.routes import router as api_router
 
-app = FastAPI(title="Black Hole Simulator API", version="0.1.0")
+app = FastAPI(title="Black Hole Simulator API", version="0.1.0", default_response_class=ORJSONResponse)
 
 # Ajuste depois para o domínio do frontend.
 app.add_middleware(
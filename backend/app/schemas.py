@@ -1,9 +1,10 @@
-from typing import Literal, List, Optional
+from typing import Annotated, Literal, List, Optional
 from pydantic import BaseModel, Field
 
 ParticleType = Literal["massive", "photon"]
 MetricType = Literal["schwarzschild"]
 RadialSign = Literal["out", "in"]  # out = aumentando r, in = diminuindo r
+PositiveFloat = Annotated[float, Field(gt=0)]
 
 
 class VeffRequest(BaseModel):
@@ -38,6 +39,7 @@ class SimulateRequest(BaseModel):
     radial_sign: RadialSign = Field("in", description="'in' cai, 'out' sai")
     phi_max: float = Field(80.0, gt=0)
     n: int = Field(4000, ge=100, le=200000)
+    n_out: Optional[int] = Field(None, ge=10, le=200000, description="máximo de pontos retornados (padrão: min(n, 4000))")
 
 
 class SimulateResponse(BaseModel):
@@ -47,6 +49,32 @@ class SimulateResponse(BaseModel):
     y: List[float]
     meta: dict
 
+class SimulateBatchRequest(BaseModel):
+    metric: MetricType = "schwarzschild"
+    particle: ParticleType = Field("massive")
+    M: float = Field(1.0, gt=0)
+    L: List[PositiveFloat] = Field(..., min_length=1, max_length=512, description="L de cada órbita")
+    E: List[PositiveFloat] = Field(..., min_length=1, max_length=512, description="E de cada órbita")
+    r0: List[PositiveFloat] = Field(..., min_length=1, max_length=512, description="r0 de cada órbita")
+    radial_sign: RadialSign = Field("in", description="'in' cai, 'out' sai")
+    phi_max: float = Field(80.0, gt=0)
+    n: int = Field(4000, ge=100, le=200000)
+    n_out: Optional[int] = Field(None, ge=10, le=200000, description="máximo de pontos retornados (padrão: min(n, 4000))")
+
+    def model_post_init(self, __context):
+        if not (len(self.L) == len(self.E) == len(self.r0)):
+            raise ValueError("L, E e r0 devem ter o mesmo tamanho")
+        if len(self.L) * self.n > 4_000_000:
+            raise ValueError("número de órbitas × n deve ser <= 4.000.000")
+
+
+class SimulateBatchResponse(BaseModel):
+    phi: List[float]
+    r: List[List[Optional[float]]]  # uma linha por órbita; null após o fim da órbita
+    x: List[List[Optional[float]]]
+    y: List[List[Optional[float]]]
+    meta: dict
+
 class VeffNCRequest(BaseModel):
     metric: Literal["nc-schwarzschild"] = "nc-schwarzschild"
     particle: ParticleType = Field(..., description="massive (partícula) ou photon (fóton)")
@@ -80,6 +108,7 @@ class SimulateNCRequest(BaseModel):
     radial_sign: RadialSign = Field("in", description="'in' cai, 'out' sai")
     phi_max: float = Field(80.0, gt=0)
     n: int = Field(4000, ge=100, le=200000)
+    n_out: Optional[int] = Field(None, ge=10, le=200000, description="máximo de pontos retornados (padrão: min(n, 4000))")
 
 
 class SimulateNCResponse(BaseModel):